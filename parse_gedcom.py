@@ -1,52 +1,97 @@
 # -*- coding: utf-8 -*-
 
+import array
+import bisect
 import collections
+import re
+
+import numpy as np
+from graphviz import Source
+
+try:
+  from numba import njit
+except ImportError:
+  # Without numba the CSR kernels still run, just interpreted.
+  def njit(*args, **kwargs):
+    if args and callable(args[0]):
+      return args[0]
+    return lambda func: func
+
+# The GEDCOM tag vocabulary is tiny. Intern the common tags so hot-path
+# comparisons like rec_type == "INDI" short-circuit on pointer identity
+# instead of comparing characters, and so a large file holds one str per
+# tag instead of one per line.
+_TYPES = dict((s, intern(s)) for s in (
+    "INDI", "FAM", "HUSB", "WIFE", "CHIL", "NAME", "SEX", "BIRT", "DEAT",
+    "DATE", "PLAC", "MARR"))
+_SPOUSE_TYPES = frozenset((_TYPES["HUSB"], _TYPES["WIFE"]))
+_EVENT_TYPES = frozenset((_TYPES["BIRT"], _TYPES["DEAT"]))
+
+class Record(object):
+  # A large GEDCOM makes millions of these; __slots__ drops the per-instance
+  # __dict__ (new-style class required for it to take effect).
+  __slots__ = ("rec_id", "rec_type", "data", "sub_recs", "_by_type")
 
-from graphviz import Digraph
-
-class Record:
   def __init__(self, rec_id, rec_type, data):
     self.rec_id = rec_id
     self.rec_type = rec_type
     self.data = data
     self.sub_recs = []
+    # Lazily built rec_type -> first sub-record index for GetFields.
+    self._by_type = None
 
   def GetFields(self, *fields):
     assert len(fields) > 0
-    for record in self.sub_recs:
-      if record.rec_type == fields[0]:
-        if len(fields) == 1:
-          return record.data
-        else:
-          return record.GetFields(*fields[1:])
+    if self._by_type is None:
+      self._by_type = {}
+      for record in self.sub_recs:
+        self._by_type.setdefault(record.rec_type, record)
+    record = self._by_type.get(fields[0])
+    if record is not None:
+      if len(fields) == 1:
+        return record.data
+      else:
+        return record.GetFields(*fields[1:])
+
+# One GEDCOM line: level, optional @xref@ id, tag, optional data tail.
+# Ex: "0 @I6@ INDI", "2 DATE 13 Dec 1985", "0 HEAD".
+_LINE_RE = re.compile(r"(\d+) (?:(@[^@]+@) )?(\S+)(?: (.*))?$")
+
+def _split_line(line):
+  """Split one GEDCOM line into (level, rec_id, rec_type, data).
+
+  The whole tokenization is a single compiled-regex match in C: no token
+  list, and data comes out as one group. Returns None for blank or
+  malformed lines."""
+  match = _LINE_RE.match(line.strip())
+  if match is None:
+    return None
+  level, rec_id, rec_type, data = match.groups()
+  rec_type = _TYPES.get(rec_type) or intern(rec_type)
+  return int(level), rec_id, rec_type, data or ""
 
 def lex(ged_file):
   """Convert a .ged file into a list of Records."""
   root = Record(None, None, None)
-  curr_for = [root]
+  # Padded well past any real GEDCOM nesting depth, so tracking the current
+  # record per level is an in-place store instead of a slice rewrite (which
+  # truncated and reallocated the list on every line). Stale deeper entries
+  # are harmless: a line at level N only ever looks at curr_for[N].
+  curr_for = [root] + [None] * 16
+  make_record = Record  # Local for the hot loop.
   for line in ged_file:
-    fields = line.split()
-    if not fields:
+    parsed = _split_line(line)
+    if parsed is None:
       continue
-    level = int(fields[0])
-    if fields[1].startswith("@"):
-      # Ex: 0 @I6@ INDI
-      rec_id = fields[1]  # Ex: @I138@ or @F31@
-      rec_type = fields[2]  # Ex: INDI or FAM
-      data = " ".join(fields[3:])
-    else:
-      # Ex: 2 DATE 13 Dec 1985
-      rec_id = None
-      rec_type = fields[1]  # Ex: NAME, DATE, PLAC, CHIL, ...
-      data = " ".join(fields[2:])
-    this_rec = Record(rec_id, rec_type, data)
-
-    # Find which record this is a sub-record of.
-    parent = curr_for[int(level)]
-    # Add as sub-record.
-    parent.sub_recs.append(this_rec)
-    # Update curr_for so that future records can be nested beneath this one.
-    curr_for[level + 1:] = [this_rec]
+    level, rec_id, rec_type, data = parsed
+    this_rec = make_record(rec_id, rec_type, data)
+
+    if level + 1 >= len(curr_for):
+      curr_for.extend([None] * 16)
+    # Add as sub-record of the current record one level up.
+    curr_for[level].sub_recs.append(this_rec)
+    # Future records can be nested beneath this one.
+    curr_for[level + 1] = this_rec
 
   return root.sub_recs
 
@@ -55,59 +100,155 @@ def date2year(date):
   if date:
     return date.split()[-1]
 
-class Person:
-  def __init__(self, record):
-    self.record = record
-    self.parents = []
-    self.children = []
+# Every Person ever parsed, by idx. Lets the traversal code work in sets of
+# small ints (C-level hashing, no object compares) and rehydrate to Person
+# only at API boundaries.
+_people_by_idx = []
+
+class Person(object):
+  """One individual, holding just the fields the tools read.
+
+  Carries the raw field values directly (filled in by parse/parse_stream)
+  rather than a back-pointer into the Record tree, so streaming parses
+  don't need to keep Records around at all."""
+  __slots__ = ("rec_id", "raw_name", "parents", "children", "idx",
+               "_name", "_sex", "_birthdate", "_deathdate")
+
+  def __init__(self, rec_id):
+    self.rec_id = rec_id
+    self.raw_name = None
+    # Adjacency as packed int32 idxs (4 bytes/entry, contiguous) rather
+    # than lists of Person pointers; look neighbors up via _people_by_idx.
+    self.parents = array.array("i")
+    self.children = array.array("i")
+    self.idx = len(_people_by_idx)
+    _people_by_idx.append(self)
+    self._name = None
+    self._sex = None
+    self._birthdate = None
+    self._deathdate = None
 
   def id(self):
-    return self.record.rec_id
+    return self.rec_id
 
   def name(self):
-    return unicode(self.record.GetFields("NAME").replace("/", ""), "utf-8")
+    # Decoded lazily and cached: most people are only traversed, and name()
+    # is called from every search/graphing loop.
+    if self._name is None:
+      self._name = unicode(self.raw_name.replace("/", ""), "utf-8")
+    return self._name
 
   def sex(self):
-    return self.record.GetFields("SEX")
+    return self._sex
 
   def birthdate(self):
-    return self.record.GetFields("BIRT", "DATE")
+    return self._birthdate
 
   def deathdate(self):
-    return self.record.GetFields("DEAT", "DATE")
+    return self._deathdate
 
   def __repr__(self):
     return "%s (%s - %s)" % (self.name().encode("ascii", "replace"),  # TODO: Remove ASCII encode.
                              date2year(self.birthdate()),
                              date2year(self.deathdate()))
 
+def _link_families(people, families):
+  """Add parent/child relationships from (parent_ids, child_ids) pairs."""
+  for parent_ids, child_ids in families:
+    for child_id in child_ids:
+      child = people[child_id]
+      for parent_id in parent_ids:
+        parent = people[parent_id]
+        child.parents.append(parent.idx)
+        parent.children.append(child.idx)
+
 def parse(records):
   """Convert a list of Records into a structured graph of people."""
   # Collect all people.
   people = {}
+  families = []
   for record in records:
     if record.rec_type == "INDI":
       assert record.rec_id not in people
-      people[record.rec_id] = Person(record)
-  # Link parents and children.
-  for record in records:
-    if record.rec_type == "FAM":
+      person = Person(record.rec_id)
+      person.raw_name = record.GetFields("NAME")
+      person._sex = record.GetFields("SEX")
+      person._birthdate = record.GetFields("BIRT", "DATE")
+      person._deathdate = record.GetFields("DEAT", "DATE")
+      people[record.rec_id] = person
+    elif record.rec_type == "FAM":
       # For this "family unit" collect all parents and all children.
       parents = []
       children = []
       for sub_rec in record.sub_recs:
-        if sub_rec.rec_type in ("HUSB", "WIFE"):
+        if sub_rec.rec_type in _SPOUSE_TYPES:
           parents.append(sub_rec.data)
         elif sub_rec.rec_type == "CHIL":
           children.append(sub_rec.data)
         # Ignore MARR, DATE, PLAC, ...
-      # Add parent/child relationships.
-      for child_id in children:
-        child = people[child_id]
-        for parent_id in parents:
-          parent = people[parent_id]
-          child.parents.append(parent)
-          parent.children.append(child)
+      families.append((parents, children))
+  _link_families(people, families)
+  return people
+
+def parse_stream(ged_file):
+  """Parse a GEDCOM stream directly into a graph of people.
+
+  Single forward pass with no intermediate Record tree: GEDCOM is a
+  forward-only format and the graph only uses a few level-1/2 fields, so a
+  small state machine (current person / family / event) captures them as
+  the lines go by. Families are linked at EOF once every INDI is known.
+  Equivalent to parse(lex(ged_file)) for the fields we keep, at a fraction
+  of the memory and interpretation cost."""
+  people = {}
+  families = []
+  person = None       # INDI currently being filled in.
+  family = None       # (parent_ids, child_ids) of the current FAM.
+  event = None        # BIRT/DEAT awaiting its level-2 DATE.
+  seen_events = None  # Event types already latched for this person.
+  for line in ged_file:
+    parsed = _split_line(line)
+    if parsed is None:
+      continue
+    level, rec_id, rec_type, data = parsed
+    if level == 0:
+      person = None
+      family = None
+      event = None
+      if rec_type == "INDI":
+        assert rec_id not in people
+        person = Person(rec_id)
+        people[rec_id] = person
+        seen_events = set()
+      elif rec_type == "FAM":
+        family = ([], [])
+        families.append(family)
+    elif person is not None:
+      if level == 1:
+        event = None
+        # First occurrence wins, like Record.GetFields did: a repeated
+        # BIRT/DEAT is ignored entirely, even if only the repeat has a DATE.
+        if rec_type == "NAME":
+          if person.raw_name is None:
+            person.raw_name = data
+        elif rec_type == "SEX":
+          if person._sex is None:
+            person._sex = data
+        elif rec_type in _EVENT_TYPES:
+          if rec_type not in seen_events:
+            seen_events.add(rec_type)
+            event = rec_type
+      elif level == 2 and event is not None and rec_type == "DATE":
+        if event == "BIRT":
+          if person._birthdate is None:
+            person._birthdate = data
+        elif person._deathdate is None:
+          person._deathdate = data
+    elif family is not None and level == 1:
+      if rec_type in _SPOUSE_TYPES:
+        family[0].append(data)
+      elif rec_type == "CHIL":
+        family[1].append(data)
+  _link_families(people, families)
   return people
 
 
@@ -120,56 +261,208 @@ def print_ahnentafel(start_person):
   while todo:
     index, person = todo.popleft()
     print index, person.name(), person.sex(), person.birthdate(), person.deathdate()
-    for i, parent in enumerate(person.parents):
-      todo.append((2 * index + i, parent))
+    for i, parent_idx in enumerate(person.parents):
+      todo.append((2 * index + i, _people_by_idx[parent_idx]))
 
 
+def _bfs_closure_ids(person, neighbors):
+  """Idxs of everyone reachable from |person| (inclusive) via |neighbors|."""
+  seen = set([person.idx])
+  todo = collections.deque([person.idx])
+  while todo:
+    for neighbor_idx in neighbors(_people_by_idx[todo.popleft()]):
+      if neighbor_idx not in seen:
+        seen.add(neighbor_idx)
+        todo.append(neighbor_idx)
+  return seen
+
+def _to_people(idxs):
+  return set(_people_by_idx[i] for i in idxs)
+
+# Memoize by idx since the graph is never mutated after parse(). Values are
+# idx sets: int set operations hash C longs instead of PyObjects.
+_ancestors_memo = {}
+_descendants_memo = {}
+
+def get_ancestor_ids(person):
+  if person.idx not in _ancestors_memo:
+    _ancestors_memo[person.idx] = _bfs_closure_ids(person, lambda p: p.parents)
+  return _ancestors_memo[person.idx]
+
+def get_descendant_ids(person):
+  if person.idx not in _descendants_memo:
+    _descendants_memo[person.idx] = _bfs_closure_ids(person,
+                                                     lambda p: p.children)
+  return _descendants_memo[person.idx]
+
 def get_ancestors(person):
-  ancestors = set([person])
-  for parent in person.parents:
-    ancestors.update(get_ancestors(parent))
-  return ancestors
+  return _to_people(get_ancestor_ids(person))
 
 def get_descendants(person):
-  descendants = set([person])
-  for parent in person.children:
-    descendants.update(get_descendants(parent))
-  return descendants
+  return _to_people(get_descendant_ids(person))
 
 def get_relatives(person):
-  relatives = set()
-  for person in get_ancestors(person):
-    relatives.update(get_descendants(person))
-  return relatives
+  relative_ids = set()
+  for ancestor_id in get_ancestor_ids(person):
+    relative_ids.update(get_descendant_ids(_people_by_idx[ancestor_id]))
+  return _to_people(relative_ids)
 
 def find_common_ancestors(person1, person2):
-  a1 = get_ancestors(person1)
-  a2 = get_ancestors(person2)
-  return a1.intersection(a2)
+  common = get_ancestor_ids(person1) & get_ancestor_ids(person2)
+  return _to_people(common)
 
 def find_most_recent(common):
   """Find all "most recent common ancestors", i.e. common ancestors whose
   children are not also common ancestors."""
-  recent = set()
+  recent = set(common)
+  common_idxs = set(person.idx for person in common)
   for person in common:
-    if not common.intersection(set(person.children)):
-      recent.add(person)
+    for child_idx in person.children:
+      if child_idx in common_idxs:
+        recent.discard(person)
+        break
   return recent
 
 def find_mrca(person1, person2):
   return find_most_recent(find_common_ancestors(person1, person2))
 
 
+@njit(cache=True)
+def _bfs_mask(start, indptr, indices, num_people):
+  """Reachability mask for a BFS from |start| over a CSR adjacency."""
+  mask = np.zeros(num_people, np.bool_)
+  queue = np.empty(num_people, np.int32)
+  queue[0] = start
+  mask[start] = True
+  head = 0
+  tail = 1
+  while head < tail:
+    v = queue[head]
+    head += 1
+    for i in range(indptr[v], indptr[v + 1]):
+      u = indices[i]
+      if not mask[u]:
+        mask[u] = True
+        queue[tail] = u
+        tail += 1
+  return mask
+
+class CsrGraph(object):
+  """The parsed people graph in compressed-sparse-row form.
+
+  Every person gets an integer idx; parent and child adjacencies become
+  int32 (indptr, indices) array pairs, so traversals run as pure integer
+  array code in _bfs_mask -- JIT-compiled when numba is available --
+  with no Python attribute access or object hashing."""
+  __slots__ = ("persons", "parent_indptr", "parent_indices",
+               "child_indptr", "child_indices")
+
+  def __init__(self, people):
+    # Reuse the registry idx assigned at construction. Idxs of one parse are
+    # contiguous but need not start at 0 (e.g. a second file), so size by
+    # the largest idx and leave holes None.
+    num = 1 + max(p.idx for p in people.itervalues())
+    self.persons = [None] * num
+    for person in people.itervalues():
+      self.persons[person.idx] = person
+    self.parent_indptr, self.parent_indices = self._build_csr(
+        lambda p: p.parents)
+    self.child_indptr, self.child_indices = self._build_csr(
+        lambda p: p.children)
+
+  def _build_csr(self, neighbors):
+    indptr = np.zeros(len(self.persons) + 1, np.int32)
+    for person in self.persons:
+      if person is not None:
+        indptr[person.idx + 1] = len(neighbors(person))
+    np.cumsum(indptr, out=indptr)
+    indices = np.empty(indptr[-1], np.int32)
+    for person in self.persons:
+      if person is not None:
+        neighbor_idxs = neighbors(person)
+        pos = indptr[person.idx]
+        indices[pos:pos + len(neighbor_idxs)] = neighbor_idxs
+    return indptr, indices
+
+  def ancestor_mask(self, person):
+    return _bfs_mask(person.idx, self.parent_indptr, self.parent_indices,
+                     len(self.persons))
+
+  def descendant_mask(self, person):
+    return _bfs_mask(person.idx, self.child_indptr, self.child_indices,
+                     len(self.persons))
+
+  def to_people(self, mask):
+    """Rehydrate a boolean mask back into a set of Persons."""
+    return set(self.persons[i] for i in np.nonzero(mask)[0])
+
+
+class BloomFilter:
+  """Approximate set membership: never a false negative, occasionally a
+  false positive, so it can cheaply veto probes before a real set lookup."""
+  def __init__(self, num_bits=1 << 20, num_hashes=3):
+    self.num_bits = num_bits
+    self.num_hashes = num_hashes
+    self.bits = bytearray(num_bits // 8)
+
+  def _positions(self, item):
+    h = hash(item)
+    for i in range(self.num_hashes):
+      # Golden-ratio stride to decorrelate the probe positions.
+      yield (h + i * 0x9e3779b9) % self.num_bits
+
+  def add(self, item):
+    for pos in self._positions(item):
+      self.bits[pos >> 3] |= 1 << (pos & 7)
+
+  def __contains__(self, item):
+    for pos in self._positions(item):
+      if not self.bits[pos >> 3] & (1 << (pos & 7)):
+        return False
+    return True
+
+
+_ancestor_lines_memo = {}
+
 def get_ancestor_lines(start_person):
-  todo = collections.deque()
-  todo.append((start_person, [start_person]))
-  ancestor_lines = collections.defaultdict(list)
+  """BFS the ancestor DAG of start_person.
+
+  Returns (ancestors, predecessors) where ancestors is the set of everyone
+  reachable (including start_person) and predecessors[p] lists the child-side
+  endpoints of every edge into p, so individual lines can be rebuilt lazily
+  with enumerate_paths. Materializing every line eagerly blows up under
+  endogamy (paths x depth list copies); the DAG is only O(V+E).
+
+  Memoized like the ancestor/descendant id sets: anyone comparing one
+  person against many (find_relationship per match, draw_relationships)
+  reuses the same DAG instead of re-running the BFS."""
+  if start_person.idx in _ancestor_lines_memo:
+    return _ancestor_lines_memo[start_person.idx]
+  ancestors = set([start_person])
+  predecessors = collections.defaultdict(list)
+  todo = collections.deque([start_person])
   while todo:
-    person, line = todo.popleft()
-    ancestor_lines[person].append(line)
-    for parent in person.parents:
-      todo.append((parent, line + [parent]))
-  return ancestor_lines
+    person = todo.popleft()
+    for parent_idx in person.parents:
+      parent = _people_by_idx[parent_idx]
+      predecessors[parent].append(person)
+      if parent not in ancestors:
+        ancestors.add(parent)
+        todo.append(parent)
+  _ancestor_lines_memo[start_person.idx] = (ancestors, predecessors)
+  return ancestors, predecessors
+
+def enumerate_paths(start_person, target, predecessors):
+  """Yield every line [start_person, ..., target] through the predecessors
+  DAG built by get_ancestor_lines(start_person)."""
+  todo = [(target, [target])]
+  while todo:
+    person, path = todo.pop()
+    if person is start_person:
+      yield path[::-1]
+    else:
+      for child in predecessors[person]:
+        todo.append((child, path + [child]))
 
 def find_relationship(person1, person2):
   """Find all independent relationships between two people.
@@ -179,28 +472,50 @@ def find_relationship(person1, person2):
   * lists of all lines from person#->MRCA (typically 1, but can be more with
     endogamy, pedigree collapse or cousin marriage in general)
   """
-  lines1 = get_ancestor_lines(person1)
-  lines2 = get_ancestor_lines(person2)
-  mrcas = find_most_recent(set(lines1).intersection(set(lines2)))
+  return find_relationship_with(person1, get_ancestor_lines(person1), person2)
+
+def find_relationship_with(person1, lines1, person2, common_filter=None):
+  """Like find_relationship, but takes the precomputed get_ancestor_lines
+  result for person1 so that callers comparing one person against many
+  (e.g. subset_dna) don't redo that BFS per comparison. common_filter is an
+  optional BloomFilter over person1's ancestors used to veto most non-common
+  ancestors before the exact set probe."""
+  ancestors1, preds1 = lines1
+  ancestors2, preds2 = get_ancestor_lines(person2)
+  if common_filter is not None:
+    common = set(p for p in ancestors2
+                 if p in common_filter and p in ancestors1)
+  else:
+    common = ancestors1.intersection(ancestors2)
+  mrcas = find_most_recent(common)
 
   relationships = []
   for anc in mrcas:
-    relationships.append((lines1[anc], lines2[anc]))
+    relationships.append((list(enumerate_paths(person1, anc, preds1)),
+                          list(enumerate_paths(person2, anc, preds2))))
   return relationships
 
+def _dot_quote(text):
+  return '"%s"' % text.replace("\\", "\\\\").replace('"', '\\"')
+
 def people2dot(people, dot_name):
   """Convert a collection of people into a DOT file showing relationships."""
-  dot = Digraph(name=dot_name)
-
+  people = set(people)  # O(1) membership for the edge filter below.
+  # Emit the DOT source as one string: per-node/per-edge Digraph calls each
+  # pay attribute-dict and escaping overhead inside graphviz, which adds up
+  # over thousands of nodes. graphviz only renders the finished text.
+  lines = ["digraph %s {" % _dot_quote(dot_name)]
   for person in people:
-    dot.node(person.id(), label=person.name())
-
+    lines.append("  %s [label=%s]" % (_dot_quote(person.id()),
+                                      _dot_quote(person.name())))
   for person in people:
-    for parent in person.parents:
+    for parent_idx in person.parents:
+      parent = _people_by_idx[parent_idx]
       if parent in people:
-        dot.edge(parent.id(), person.id())
-
-  dot.view()
+        lines.append("  %s -> %s" % (_dot_quote(parent.id()),
+                                     _dot_quote(person.id())))
+  lines.append("}")
+  Source("\n".join(lines), filename="%s.gv" % dot_name).view()
 
 def relationships2people(relationships):
   people = set()
@@ -216,32 +531,84 @@ def draw_relationships(person1, person2):
   people2dot(people, "%s_%s" % (person1.name(), person2.name()))
 
 
+def build_name_index(people):
+  """Index people by name: an exact-match dict plus sorted (name, person)
+  pairs for prefix queries. For duplicate names the dict keeps the first
+  person seen, matching the old first-match scan."""
+  by_name = {}
+  by_sorted = []
+  for person in people.itervalues():
+    name = person.name()
+    by_name.setdefault(name, person)
+    by_sorted.append((name, person))
+  by_sorted.sort()
+  return by_name, by_sorted
+
+# Built lazily per people dict (keyed by identity) so every name search
+# after the first is a lookup instead of an O(N) decode-and-compare scan.
+# Entries are (people, index): id() of a dead dict can be recycled by a new
+# one, so each entry pins the dict it was built for and is verified by
+# identity on lookup rather than trusting the address alone.
+_name_index_memo = {}
+
+def _name_index(people):
+  key = id(people)
+  entry = _name_index_memo.get(key)
+  if entry is None or entry[0] is not people:
+    entry = (people, build_name_index(people))
+    _name_index_memo[key] = entry
+  return entry[1]
+
 def find_person(name, people):
-  for person in people.values():
-    if person.name() == name:
-      return person
-  raise Exception, ("No person named %s" % name)
+  by_name, _ = _name_index(people)
+  try:
+    return by_name[name]
+  except KeyError:
+    raise Exception, ("No person named %s" % name)
 
 def find_prefix(prefix, people):
+  _, by_sorted = _name_index(people)
+  # Names sharing a prefix are contiguous in the sorted pairs; binary-search
+  # to the start of the run and walk it: O(log N + matches), not O(N).
   filtered = []
-  for person in people.values():
-    if person.name().startswith(prefix):
-      filtered.append(person)
+  i = bisect.bisect_left(by_sorted, (prefix,))
+  while i < len(by_sorted) and by_sorted[i][0].startswith(prefix):
+    filtered.append(by_sorted[i][1])
+    i += 1
   return filtered
 
 
-def subset_dna(people):
+def subset_dna(people, graph=None):
   """Filter people so that it only includes people who are directly on
   relationship links between the home person (prefixed with 🏠) and
   all DNA matches (prefixed with 🔬)."""
   home_person, = find_prefix(u"🏠", people)
   dna_matches = find_prefix(u"🔬", people)
 
-  filtered_people = set()
+  # The heavy lifting runs on CsrGraph reachability masks: the home mask is
+  # computed once, per-match intersections are vectorized bitwise ANDs, and
+  # the people on the connecting lines fall out as desc(mrca) & anc(person)
+  # without materializing any path lists.
+  if graph is None:
+    graph = CsrGraph(people)
+  home_anc = graph.ancestor_mask(home_person)
+
+  filtered = np.zeros(len(graph.persons), np.bool_)
   for match in dna_matches:
-    filtered_people.update(relationships2people(find_relationship(home_person,
-                                                                  match)))
-  return filtered_people
+    match_anc = graph.ancestor_mask(match)
+    common = home_anc & match_anc
+    # An MRCA is a common ancestor none of whose children is also common,
+    # i.e. who is not a parent of any common ancestor.
+    parent_of_common = np.zeros_like(common)
+    for i in np.nonzero(common)[0]:
+      parents = graph.parent_indices[
+          graph.parent_indptr[i]:graph.parent_indptr[i + 1]]
+      parent_of_common[parents] = True
+    for mrca in np.nonzero(common & ~parent_of_common)[0]:
+      on_lines = _bfs_mask(mrca, graph.child_indptr, graph.child_indices,
+                           len(graph.persons))
+      filtered |= on_lines & (home_anc | match_anc)
+  return graph.to_people(filtered)
 
 def filter_relatives(people, filter_person):
   """Filter people to only include relatives of filter_person."""
@@ -249,28 +616,37 @@ def filter_relatives(people, filter_person):
 
 def find_roots(people):
   """Find who has no parents (root ancestors)."""
-  filtered_people = set()
-  for person in people:
-    if not set(person.parents).intersection(people):
-      filtered_people.add(person)
-  return filtered_people
+  # any() short-circuits on the first parent found, with no temporary sets.
+  people_set = people if isinstance(people, set) else set(people)
+  people_idxs = set(person.idx for person in people_set)
+  return set(person for person in people_set
+             if not any(parent_idx in people_idxs
+                        for parent_idx in person.parents))
 
 def find_not_in(people, filter):
   """Find minimum people in |people| not in |filter|."""
   new_people = set()
   for person in people.intersection(filter):
-    new_people.update(set(person.parents) - filter)
+    for parent_idx in person.parents:
+      parent = _people_by_idx[parent_idx]
+      if parent not in filter:
+        new_people.add(parent)
     if len(person.parents) < 2:
-     new_people.add("[Unknown parent(s) of %r]" % person)
+      new_people.add("[Unknown parent(s) of %r]" % person)
   return new_people
 
 
+import mmap
 import pprint
 import sys
-ged_file = file(sys.argv[1])
-
-records = lex(ged_file)
-people = parse(records)
+# Map the file instead of buffered text-mode reads: the parser slices byte
+# strings (py2 str) directly out of the page cache and only NAME data ever
+# gets decoded, so there is no per-line read/copy overhead.
+ged_fh = open(sys.argv[1], "rb")
+ged_file = mmap.mmap(ged_fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+people = parse_stream(iter(ged_file.readline, ""))
+graph = CsrGraph(people)
 home_person, = find_prefix(u"🏠", people)
 
 # Find all relationships between two people:
@@ -284,17 +660,17 @@ home_person, = find_prefix(u"🏠", people)
 
 # Make a DOT graph only people allong DNA relationships:
 name = unicode(sys.argv[2])
-people2dot(filter_relatives(subset_dna(people),
+people2dot(filter_relatives(subset_dna(people, graph),
                             find_person(name, people)),
            name)
 
 # Find all DNA MRCAs (MRCAs between home person and a DNA match
 # who doesn't have an ancestor who's also an MRCA for another match)
-pprint.pprint(find_roots(subset_dna(people)))
+pprint.pprint(find_roots(subset_dna(people, graph)))
 
 # Find all ancestors in GEDCOM which are not DNA connected.
 #pprint.pprint(find_not_in(get_ancestors(home_person),
-#                          subset_dna(people)))
+#                          subset_dna(people, graph)))
 
 # Find all brick walls.
 #pprint.pprint(find_roots(get_ancestors(home_person)))